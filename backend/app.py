@@ -1,85 +1,143 @@
 # Final, corrected code for backend/app.py with the definitive fix
 
-from flask import Flask, request, jsonify
+from flask import Flask, request
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
+import orjson
 import os
 import tempfile
-from datetime import datetime
-from gradio_client import Client
+import threading
+import concurrent.futures
+import time
+from gradio_client import Client, handle_file
 
 app = Flask(__name__)
 
+# Largest request body we accept (50 MB); bigger uploads are rejected with 413
+MAX_UPLOAD_SIZE = 50 * 1024 * 1024
+# Copy uploads to disk in 1 MiB chunks instead of werkzeug's 16 KiB default
+UPLOAD_BUFFER_SIZE = 1024 * 1024
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_SIZE
+
+# This UPLOAD_FOLDER logic is for a different feature and can be kept or removed
+UPLOAD_FOLDER = "uploads"
+os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+
 # --- Correct CORS Configuration ---
 # This explicitly allows your Vercel frontend to make requests.
 CORS(app, resources={r"/api/*": {"origins": "https://somali-toxicity-detector.vercel.app"}})
 
+# --- JSON Responses ---
+# orjson serializes much faster than the stdlib json used by Flask's jsonify.
+def ojsonify(obj, status=200):
+    return app.response_class(orjson.dumps(obj), status=status, mimetype='application/json')
+
+# Keep oversized uploads consistent with the other JSON error responses
+@app.errorhandler(413)
+def file_too_large(e):
+    return ojsonify({"error": "File too large"}, 413)
+
+# --- Hugging Face Spaces ---
+# Define the names of your Spaces
+TOXICITY_SPACE = "ooloteam/SomaliSpeechToxicityClassifier"
+# Make sure this is the correct name for your ASR space when you create it
+ASR_SPACE = "ooloteam/wav2vec2-somali-api"
+
+# --- Gradio Clients ---
+# Creating a Client fetches the Space's config over the network, so we build
+# one per Space the first time it is needed and reuse it for later requests.
+HF_TOKEN = os.getenv("HF_TOKEN")
+# Overall deadline (seconds) for one prediction, so a slow Space cannot pin
+# a worker indefinitely. It covers the whole job (upload, queueing on the
+# Space and inference): about a minute for a slow or waking Space plus a few
+# seconds to upload the audio.
+PREDICT_TIMEOUT = 65
+_CLIENTS = {}
+_CLIENTS_LOCK = threading.Lock()
+
+def get_client(space_name):
+    client = _CLIENTS.get(space_name)
+    if client is None:
+        with _CLIENTS_LOCK:
+            client = _CLIENTS.get(space_name)
+            if client is None:
+                client = _CLIENTS[space_name] = Client(space_name, hf_token=HF_TOKEN)
+    return client
+
 # --- API Endpoints ---
 @app.route('/api/process', methods=['POST'])
 def process_audio():
     if 'audio' not in request.files:
-        return jsonify({"error": "No audio file provided"}), 400
+        return ojsonify({"error": "No audio file provided"}, 400)
     
     audio_file = request.files['audio']
     model_type = request.form.get('model_type')
 
-    # Define the names of your Spaces
-    toxicity_space = "ooloteam/SomaliSpeechToxicityClassifier"
-    # Make sure this is the correct name for your ASR space when you create it
-    asr_space = "ooloteam/wav2vec2-somali-api" 
-
     if model_type == 'audio_to_audio':
-        space_to_call = toxicity_space
+        space_to_call = TOXICITY_SPACE
     elif model_type == 'asr_classification':
-        space_to_call = asr_space
+        space_to_call = ASR_SPACE
     else:
-        return jsonify({"error": "Invalid model type"}), 400
-
-    # Save the uploaded file to a temporary path to send to the client
-    temp_dir = tempfile.gettempdir()
-    temp_path = os.path.join(temp_dir, secure_filename(audio_file.filename))
-    audio_file.save(temp_path)
-
-    try:
-        # Connect to the Space using the gradio_client
-        client = Client(space_to_call)
-        
-        # --- THIS IS THE FINAL FIX ---
-        # We are now explicitly telling the API that the file is for the 'audio' argument.
-        result = client.predict(
-            audio=temp_path,
-            api_name="/predict" 
-        )
-        # ---------------------------
-        
-        os.remove(temp_path)
-        return jsonify({"status": "success", "result": result})
-        
-    except Exception as e:
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
-        return jsonify({"error": f"An error occurred: {str(e)}"}), 500
+        return ojsonify({"error": "Invalid model type"}, 400)
+
+    # gradio_client only uploads from a file path, so the upload still has to
+    # touch disk. Each request gets its own temporary directory so concurrent
+    # uploads with the same filename cannot overwrite each other, and the
+    # directory is cleaned up however we leave this block.
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp_path = os.path.join(temp_dir, secure_filename(audio_file.filename) or "audio")
+        audio_file.save(temp_path, buffer_size=UPLOAD_BUFFER_SIZE)
+
+        try:
+            # Reuse the cached connection to the Space
+            client = get_client(space_to_call)
+            
+            # --- THIS IS THE FINAL FIX ---
+            # We are now explicitly telling the API that the file is for the 'audio' argument.
+            # handle_file() makes the client upload the raw bytes as multipart
+            # instead of sending the path (or a base64 data URI) inside the JSON.
+            # submit() runs the call on the client's own worker pool and gives
+            # back a Job (a Future), so we can wait on it with a deadline.
+            job = client.submit(
+                audio=handle_file(temp_path),
+                api_name="/predict" 
+            )
+            # ---------------------------
+            result = job.result(timeout=PREDICT_TIMEOUT)
+            return ojsonify({"status": "success", "result": result})
+            
+        except concurrent.futures.TimeoutError:
+            # cancel() cannot stop a job that is already running, so the
+            # client's worker may still be uploading temp_path when the
+            # directory is removed below. That upload then fails in the
+            # background, which is accepted: its result is discarded anyway.
+            job.cancel()
+            return ojsonify({"error": "The model took too long to respond"}, 504)
+
+        except Exception as e:
+            return ojsonify({"error": f"An error occurred: {str(e)}"}, 500)
 
 
 # --- Your Other Endpoints (No changes needed) ---
 @app.route('/api/upload', methods=['POST'])
 def upload_audio():
-    if 'audio' not in request.files: return jsonify({'error': 'No audio file provided'}), 400
+    if 'audio' not in request.files: return ojsonify({'error': 'No audio file provided'}, 400)
     file = request.files['audio']
-    if file.filename == '': return jsonify({'error': 'No file selected'}), 400
-    filename = secure_filename(f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{file.filename}")
-    # This UPLOAD_FOLDER logic is for a different feature and can be kept or removed
-    UPLOAD_FOLDER = "uploads"
-    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+    if file.filename == '': return ojsonify({'error': 'No file selected'}, 400)
+    filename = secure_filename(f"{time.strftime('%Y%m%d_%H%M%S')}_{file.filename}")
     filepath = os.path.join(UPLOAD_FOLDER, filename)
-    file.save(filepath)
-    return jsonify({'url': f'/uploads/{filename}'})
+    file.save(filepath, buffer_size=UPLOAD_BUFFER_SIZE)
+    return ojsonify({'url': f'/uploads/{filename}'})
 
 
 @app.route('/api/feedback', methods=['POST'])
 def submit_feedback():
-    return jsonify({"message": "Feedback endpoint called"})
+    return ojsonify({"message": "Feedback endpoint called"})
 
 
+# In production run under gunicorn with threaded workers instead of this
+# development server, e.g.:
+#   gunicorn -k gthread -w 2 --threads 16 -b 0.0.0.0:5000 app:app
+# The debugger and reloader are only enabled when FLASK_DEV is 1/true/yes.
 if __name__ == '__main__':
-    app.run(port=5000, debug=True)
+    app.run(port=5000, debug=os.getenv("FLASK_DEV", "").lower() in ("1", "true", "yes"))
@@ -1,28 +1,60 @@
-import librosa
+import os
+
 import numpy as np
 import soundfile as sf
+import soxr
 
 SAMPLE_RATE = 16000
 
 def load_and_preprocess(audio_path, target_sr=SAMPLE_RATE, mono=True):
     """
     Load audio, convert to mono, and resample to target sample rate.
-    Returns waveform as float32 numpy array and sample rate.
+    Returns waveform as float32 numpy array and sample rate. With mono=False
+    a multi-channel waveform is shaped (channels, frames), as librosa returned.
+    Only formats libsndfile can decode (wav, flac, ogg, mp3, ...) are
+    supported; containers like mp4/m4a go through prepare_audio_for_api.
     """
-    waveform, orig_sr = librosa.load(audio_path, sr=None, mono=mono)
+    waveform, orig_sr = sf.read(audio_path, dtype='float32', always_2d=False)
+    if mono and waveform.ndim == 2:
+        waveform = waveform.mean(axis=1, dtype=np.float32)
     if orig_sr != target_sr:
-        waveform = librosa.resample(waveform, orig_sr=orig_sr, target_sr=target_sr)
-    return waveform.astype(np.float32), target_sr
+        # libsoxr's polyphase resampler is far faster than librosa's default
+        waveform = soxr.resample(waveform, orig_sr, target_sr, quality='HQ')
+    if waveform.ndim == 2:
+        # soundfile/soxr work on (frames, channels); keep librosa's layout
+        waveform = waveform.T
+    return waveform, target_sr
 
 def save_as_16bit_pcm(audio_path, output_path):
     """
     Load audio, preprocess to 16 kHz mono, and save as 16-bit PCM WAV.
     """
     waveform, sr = load_and_preprocess(audio_path)
-    # Convert to 16-bit PCM range (-32768 to 32767)
-    waveform = np.clip(waveform, -1.0, 1.0)
-    waveform_16bit = (waveform * 32767).astype(np.int16)
-    sf.write(output_path, waveform_16bit, sr, subtype='PCM_16')
+    write_16bit_pcm(output_path, waveform, sr)
+
+def write_16bit_pcm(output_path, waveform, sr):
+    """
+    Write a float32 waveform as 16-bit PCM WAV.
+    libsndfile scales, rounds and clips to int16 in one pass (soundfile turns
+    on SFC_SET_CLIPPING for every file it opens).
+    """
+    sf.write(output_path, waveform, sr, subtype='PCM_16')
+
+def check_format(audio_path):
+    """
+    Check from the file header alone (no decode) whether audio is already
+    16 kHz, mono, 16-bit PCM. Takes a filesystem path only. Files libsndfile
+    cannot decode (e.g. mp4) are reported as not in the required format; a
+    missing path raises FileNotFoundError.
+    """
+    if not os.path.isfile(audio_path):
+        raise FileNotFoundError(audio_path)
+    try:
+        info = sf.info(audio_path)
+    except RuntimeError:
+        # The file exists, so this is libsndfile not recognising the format
+        return False
+    return info.channels == 1 and info.samplerate == SAMPLE_RATE and info.subtype == 'PCM_16'
 
 def check_and_convert(audio_path, output_path=None):
     """
@@ -30,28 +62,17 @@ def check_and_convert(audio_path, output_path=None):
     If not, convert and save to output_path (if provided).
     Returns waveform, sample_rate, and a flag indicating if conversion was needed.
     """
-    # Load metadata to check format
-    info = sf.info(audio_path)
-    is_mono = info.channels == 1
-    is_16khz = info.samplerate == SAMPLE_RATE
-    is_16bit = info.subtype == 'PCM_16'
-
-    if is_mono and is_16khz and is_16bit:
+    if check_format(audio_path):
         print("Audio is already in required format (16 kHz, mono, 16-bit PCM)")
-        waveform, sr = librosa.load(audio_path, sr=SAMPLE_RATE, mono=True)
+        waveform, sr = load_and_preprocess(audio_path)
         return waveform, sr, False
     else:
         print("Audio is not in required format. Converting...")
         # Load and preprocess
-        waveform, sr = librosa.load(audio_path, sr=None, mono=True)
-        if sr != SAMPLE_RATE:
-            waveform = librosa.resample(waveform, orig_sr=sr, target_sr=SAMPLE_RATE)
-            sr = SAMPLE_RATE
+        waveform, sr = load_and_preprocess(audio_path)
         # Save as 16-bit PCM if output_path is provided
         if output_path:
-            waveform = np.clip(waveform, -1.0, 1.0)
-            waveform_16bit = (waveform * 32767).astype(np.int16)
-            sf.write(output_path, waveform_16bit, sr, subtype='PCM_16')
+            write_16bit_pcm(output_path, waveform, sr)
         return waveform, sr, True
 
 # Example usage (uncomment to test)
@@ -1,35 +1,55 @@
 # This is the new, full content for backend/models/toxicity_classifier.py
 
-from pydub import AudioSegment
-import io
+import av
+import numpy as np
+import struct
 
 # The sample rate your models on Hugging Face expect
 TARGET_SR = 16000
 
+# RIFF/WAVE header for 16-bit mono PCM, compiled once instead of per call
+_WAV_HEADER = struct.Struct('<4sI4s4sIHHIIHH4sI')
+
 def prepare_audio_for_api(file_path, file_format):
     """
     This function takes an audio or video file, converts it to the correct
-    format for the Hugging Face API, and returns the raw audio data (bytes).
+    format for the Hugging Face API, and returns the raw audio data as a
+    bytes-like memoryview over a single pre-sized WAV buffer (not bytes:
+    wrap it in bytes() before calling bytes methods or JSON-encoding it).
     """
-    # Load the file using pydub. It can handle both audio and video files.
-    if file_format == 'mp4':
-        audio = AudioSegment.from_file(file_path, format="mp4")
-    else:
-        # Works for wav, mp3, etc.
-        audio = AudioSegment.from_file(file_path)
-
-    # 1. Convert to a single channel (mono)
-    audio = audio.set_channels(1)
-    # 2. Set the sample rate to 16kHz
-    audio = audio.set_frame_rate(TARGET_SR)
+    # Decode in-process with PyAV (libav) instead of spawning ffmpeg.
+    # libav probes the container itself, so mp4 (video) and wav/mp3 files
+    # all take the same path and file_format is not needed to open them.
+    with av.open(file_path) as container:
+        stream = container.streams.audio[0]
+        # Convert to a single channel (mono), 16kHz, 16-bit samples in one step
+        resampler = av.AudioResampler(format='s16', layout='mono', rate=TARGET_SR)
+        chunks = []
+        for frame in container.decode(stream):
+            for resampled in resampler.resample(frame):
+                chunks.append(resampled.to_ndarray()[0])
+        # Flush whatever the resampler is still holding
+        for resampled in resampler.resample(None):
+            chunks.append(resampled.to_ndarray()[0])
 
-    # Export the processed audio into an in-memory file (a buffer)
-    # instead of saving it to disk.
-    buffer = io.BytesIO()
-    audio.export(buffer, format="wav") # Export as WAV format
-    
-    # Get the raw bytes from the buffer
-    processed_bytes = buffer.getvalue()
-    buffer.close()
+    # Build the WAV in a single buffer sized up front (44-byte header plus
+    # 2 bytes per 16-bit mono sample) instead of exporting through BytesIO.
+    num_samples = sum(len(chunk) for chunk in chunks)
+    data_size = num_samples * 2
+    buffer = bytearray(_WAV_HEADER.size + data_size)
+    _WAV_HEADER.pack_into(
+        buffer, 0,
+        b'RIFF', 36 + data_size, b'WAVE',
+        b'fmt ', 16, 1, 1, TARGET_SR, TARGET_SR * 2, 2, 16,
+        b'data', data_size,
+    )
+    # Copy the decoded chunks straight into the data section
+    pcm = np.frombuffer(buffer, dtype='<i2', offset=_WAV_HEADER.size)
+    pos = 0
+    for chunk in chunks:
+        pcm[pos:pos + len(chunk)] = chunk
+        pos += len(chunk)
 
-    return processed_bytes
\ No newline at end of file
+    # Zero-copy handoff as a bytes-like memoryview (fine for file writes or
+    # requests' data=); call bytes() if you need a real bytes object
+    return memoryview(buffer)
\ No newline at end of file